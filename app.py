@@ -1,14 +1,27 @@
+import gzip
+import hashlib
+import itertools
+import json
 import os
 import re
+import mimetypes
+import queue
 import sqlite3
+import stat
+import string
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta, timezone
 from pathlib import Path
 
 import bcrypt
 import jwt
+import orjson
 from dotenv import load_dotenv
-from fastapi import FastAPI, Header, HTTPException, Query
-from fastapi.responses import FileResponse
+from fastapi import FastAPI, Header, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import ORJSONResponse, Response
 from fastapi.routing import APIRouter
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel
@@ -22,90 +35,351 @@ JWT_EXPIRY_HOURS = 24
 DB_PATH = Path(__file__).parent / "garage-library.db"
 DATABASE_BACKUP_DIRECTORY = os.environ.get("DATABASE_BACKUP_DIRECTORY")
 ALLOW_CREATE_ACCOUNT = os.environ.get("ALLOW_CREATE_ACCOUNT", "").lower() in ("1", "true", "yes")
+# bcrypt cost factor: 12 is ~250ms per hash; 10 (the OWASP floor) is ~60ms if
+# registration/login bursts ever become a problem. Existing hashes migrate to
+# the configured cost transparently on the next successful login.
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", "12"))
+
+# ORJSONResponse as the default keeps even the endpoints that still go
+# through Pydantic response models on the C JSON encoder.
+app = FastAPI(title="Garage Library API", default_response_class=ORJSONResponse)
+
+
+# --- SQL ---
+
+# Hot statements are module constants: the same interned string hits
+# sqlite3's per-connection statement cache on every call, so statements are
+# parsed and planned once instead of per request.
+
+# JSON aggregation of a stack's books, ordered by position, so stack+books
+# come back in a single statement instead of two round-trips.
+BOOKS_JSON_SUBQUERY = (
+    "(SELECT json_group_array(json_object("
+    "'id', b.id, 'title', b.title, 'author', b.author, 'publisher', b.publisher, "
+    "'year', b.year, 'stack_id', b.stack_id, 'position', b.position, 'user_id', b.user_id)) "
+    "FROM (SELECT * FROM book WHERE stack_id = s.id ORDER BY position) b)"
+)
+
+SQL_SELECT_BOOK = "SELECT id, title, author, publisher, year, stack_id, position, user_id FROM book WHERE id = ?"
+SQL_LIST_BOOKS = "SELECT id, title, author, publisher, year, stack_id, position, user_id FROM book"
+SQL_LIST_STACKS_FOR_USER = "SELECT id, name, location, user_id FROM stack WHERE user_id = ?"
+SQL_STACK_WITH_BOOKS = (
+    f"SELECT s.id, s.name, s.location, s.user_id, {BOOKS_JSON_SUBQUERY} AS books "
+    "FROM stack s WHERE s.id = ? AND s.user_id = ?"
+)
+SQL_STACK_BOOKS_JSON = f"SELECT {BOOKS_JSON_SUBQUERY} AS books FROM stack s WHERE s.id = ?"
+SQL_SEARCH_BOOKS_FTS = (
+    "SELECT b.id, b.title, b.author, b.publisher, b.year, b.stack_id, s.name as stack_name, b.user_id "
+    "FROM book_fts f JOIN book b ON b.id = f.rowid JOIN stack s ON b.stack_id = s.id "
+    "WHERE book_fts MATCH ? AND b.user_id = ? ORDER BY b.title"
+)
+# The search endpoint has 15 valid field combinations, so the FTS column
+# filter and the LIKE-fallback SQL for each are built once here rather than
+# string-assembled per request; stable SQL text also keeps the fallback in
+# the statement cache.
+SEARCH_FIELDS = ("title", "author", "publisher", "year")
+SEARCH_COLUMN_FILTER: dict[tuple[bool, bool, bool, bool], str] = {}
+SQL_SEARCH_BOOKS_LIKE: dict[tuple[bool, bool, bool, bool], str] = {}
+for _combo in itertools.product((False, True), repeat=len(SEARCH_FIELDS)):
+    if not any(_combo):
+        continue
+    _selected = [f for f, _on in zip(SEARCH_FIELDS, _combo) if _on]
+    SEARCH_COLUMN_FILTER[_combo] = "{%s}" % " ".join(_selected)
+    SQL_SEARCH_BOOKS_LIKE[_combo] = (
+        "SELECT b.id, b.title, b.author, b.publisher, b.year, b.stack_id, s.name as stack_name, b.user_id "
+        "FROM book b JOIN stack s ON b.stack_id = s.id "
+        f"WHERE ({' OR '.join(f'b.{col} LIKE :q' for col in _selected)}) AND b.user_id = :uid "
+        "ORDER BY b.title"
+    )
 
-app = FastAPI(title="Garage Library API")
+SQL_SELECT_USER_ID = "SELECT id FROM user WHERE id = ?"
+# RETURNING (SQLite 3.35+) hands the fresh row back from the write itself,
+# sparing the follow-up SELECT; on older SQLite the suffix is empty and the
+# write endpoints fall back to a read-back by id.
+HAS_RETURNING = sqlite3.sqlite_version_info >= (3, 35, 0)
+RETURNING_BOOK = (
+    " RETURNING id, title, author, publisher, year, stack_id, position, user_id"
+    if HAS_RETURNING
+    else ""
+)
+SQL_INSERT_BOOK = (
+    "INSERT INTO book (title, author, publisher, year, stack_id, position, user_id) "
+    "VALUES (?, ?, ?, ?, ?, ?, ?)" + RETURNING_BOOK
+)
+SQL_INSERT_BOOK_AT_END = (
+    "INSERT INTO book (title, author, publisher, year, stack_id, position, user_id) "
+    "VALUES (?, ?, ?, ?, ?, (SELECT COALESCE(MAX(position) + 1, 0) FROM book WHERE stack_id = ?), ?)"
+    + RETURNING_BOOK
+)
+SQL_INSERT_STACK = "INSERT INTO stack (name, location, user_id) VALUES (?, ?, ?)"
+
+
+# Rows come back as plain dicts, which is what orjson and the response cache
+# consume anyway; sqlite3.Row would only add a wrapper object that every hot
+# path immediately copied into a dict.
+def _dict_row(cursor, row):
+    return {d[0]: v for d, v in zip(cursor.description, row)}
+
+
+# Connections are long-lived and shared across requests so SQLite's
+# per-connection page cache stays warm instead of being thrown away after
+# every request. Under WAL, SQLite supports any number of concurrent readers
+# alongside a single writer, so the app keeps exactly that shape: one writer
+# connection serialized by a lock, and a small pool of read-only connections
+# that FastAPI's threadpool can use in parallel. check_same_thread=False is
+# safe here because the sqlite3 module serializes individual statements and
+# each connection is only ever used by one request at a time.
+READER_POOL_SIZE = int(os.environ.get("READER_POOL_SIZE", "4"))
+
+
+def _connect(read_only: bool = False) -> sqlite3.Connection:
+    # cached_statements is sized to hold every module-level SQL constant plus
+    # the handful of inline statements, so nothing hot is ever re-prepared.
+    conn = sqlite3.connect(
+        DB_PATH, check_same_thread=False, isolation_level=None, cached_statements=128
+    )
+    conn.row_factory = _dict_row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute("PRAGMA temp_store=memory")
+    conn.execute("PRAGMA cache_size=-64000")
+    # Map up to 256MB of the DB file so hot pages are read straight from the
+    # page cache instead of through pread syscalls.
+    conn.execute("PRAGMA mmap_size=268435456")
+    # Wait out a busy writer instead of failing immediately with SQLITE_BUSY.
+    conn.execute("PRAGMA busy_timeout=5000")
+    if read_only:
+        conn.execute("PRAGMA query_only=1")
+    return conn
 
 
-def get_db() -> sqlite3.Connection:
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+_writer = _connect()
+_db_write_lock = threading.Lock()
+_readers: queue.LifoQueue = queue.LifoQueue()
+for _ in range(READER_POOL_SIZE):
+    _readers.put(_connect(read_only=True))
 
 
-def init_db():
-    conn = get_db()
-    conn.execute(
-        """CREATE TABLE IF NOT EXISTS user (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            username TEXT NOT NULL UNIQUE,
-            password_hash TEXT NOT NULL
-        )"""
-    )
-    conn.commit()
+@contextmanager
+def get_writer():
+    with _db_write_lock:
+        yield _writer
 
-    # Migration: add level column
+
+@contextmanager
+def get_reader():
+    conn = _readers.get()
     try:
-        conn.execute("ALTER TABLE user ADD COLUMN level INTEGER NOT NULL DEFAULT 1")
+        yield conn
+    finally:
+        # A handler that bailed mid-cursor can leave a read transaction (and
+        # its WAL snapshot) open; roll it back so the connection goes back to
+        # the pool clean.
+        if conn.in_transaction:
+            conn.rollback()
+        _readers.put(conn)
+
+
+# Bumped whenever a migration is added below; once a database reports this
+# version, startup does a single SELECT instead of re-running every ALTER,
+# backfill, and CREATE INDEX attempt.
+SCHEMA_VERSION = 7
+
+
+def init_db():
+    # Runs at import, before any requests exist, so the writer is used
+    # directly without taking the lock.
+    conn = _writer
+    conn.execute("CREATE TABLE IF NOT EXISTS schema_version (v INTEGER NOT NULL)")
+    row = conn.execute("SELECT v FROM schema_version").fetchone()
+    version = row["v"] if row else 0
+    if version >= SCHEMA_VERSION:
+        return
+
+    if version < 1:
+        conn.execute(
+            """CREATE TABLE IF NOT EXISTS user (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username TEXT NOT NULL UNIQUE,
+                password_hash TEXT NOT NULL
+            )"""
+        )
+        # Migration: add level column
+        try:
+            conn.execute("ALTER TABLE user ADD COLUMN level INTEGER NOT NULL DEFAULT 1")
+        except Exception:
+            pass  # column already exists
+        # Ensure matthewtrump is admin
+        conn.execute("UPDATE user SET level = 2 WHERE username = 'matthewtrump'")
         conn.commit()
-    except Exception:
-        pass  # column already exists
 
-    # Ensure matthewtrump is admin
-    conn.execute("UPDATE user SET level = 2 WHERE username = 'matthewtrump'")
-    conn.commit()
+    if version < 2:
+        # Migration: add user_id column to book
+        try:
+            conn.execute("ALTER TABLE book ADD COLUMN user_id INTEGER REFERENCES user(id)")
+        except Exception:
+            pass  # column already exists
+        # Set all existing books to user_id 2
+        conn.execute("UPDATE book SET user_id = 2 WHERE user_id IS NULL")
+        conn.commit()
 
-    # Migration: add user_id column to book
-    try:
-        conn.execute("ALTER TABLE book ADD COLUMN user_id INTEGER REFERENCES user(id)")
+    if version < 3:
+        # Migration: add user_id column to stack
+        try:
+            conn.execute("ALTER TABLE stack ADD COLUMN user_id INTEGER REFERENCES user(id)")
+        except Exception:
+            pass  # column already exists
+        # Set all existing stacks to user_id 2
+        conn.execute("UPDATE stack SET user_id = 2 WHERE user_id IS NULL")
         conn.commit()
-    except Exception:
-        pass  # column already exists
 
-    # Set all existing books to user_id 2
-    conn.execute("UPDATE book SET user_id = 2 WHERE user_id IS NULL")
-    conn.commit()
+    if version < 4:
+        # Indexes for the hot filter columns. The composite (stack_id, position)
+        # index also satisfies the ORDER BY position queries without a sort.
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_book_stack_pos ON book(stack_id, position)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_book_user ON book(user_id)")
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_stack_user ON stack(user_id)")
+        try:
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_stack_name ON stack(name)")
+        except Exception:
+            pass  # legacy data may hold duplicate names; uniqueness stays app-enforced
+        conn.commit()
 
-    # Migration: add user_id column to stack
-    try:
-        conn.execute("ALTER TABLE stack ADD COLUMN user_id INTEGER REFERENCES user(id)")
+    if version < 5:
+        # Full-text index over the searchable book columns, kept in sync by
+        # triggers, so search_books can use an FTS5 MATCH instead of LIKE scans.
+        conn.execute(
+            """CREATE VIRTUAL TABLE IF NOT EXISTS book_fts USING fts5(
+                title, author, publisher, year, content='book', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )"""
+        )
+        conn.executescript(
+            """CREATE TRIGGER IF NOT EXISTS book_ai AFTER INSERT ON book BEGIN
+                INSERT INTO book_fts(rowid, title, author, publisher, year)
+                VALUES (new.id, new.title, new.author, new.publisher, new.year);
+            END;
+            CREATE TRIGGER IF NOT EXISTS book_ad AFTER DELETE ON book BEGIN
+                INSERT INTO book_fts(book_fts, rowid, title, author, publisher, year)
+                VALUES ('delete', old.id, old.title, old.author, old.publisher, old.year);
+            END;
+            CREATE TRIGGER IF NOT EXISTS book_au AFTER UPDATE ON book BEGIN
+                INSERT INTO book_fts(book_fts, rowid, title, author, publisher, year)
+                VALUES ('delete', old.id, old.title, old.author, old.publisher, old.year);
+                INSERT INTO book_fts(rowid, title, author, publisher, year)
+                VALUES (new.id, new.title, new.author, new.publisher, new.year);
+            END;"""
+        )
+        # Backfill books that predate the FTS table (the triggers keep it in
+        # sync from here on).
+        conn.execute("INSERT INTO book_fts(book_fts) VALUES ('rebuild')")
         conn.commit()
-    except Exception:
-        pass  # column already exists
 
-    # Set all existing stacks to user_id 2
-    conn.execute("UPDATE stack SET user_id = 2 WHERE user_id IS NULL")
+    if version < 6:
+        # Populate sqlite_stat1 so the planner knows the index selectivities
+        # instead of guessing; without it the stack/user indexes can lose to
+        # a table scan on skewed data.
+        conn.execute("ANALYZE")
+        conn.commit()
+
+    if version < 7:
+        # The tokenizer is baked into the FTS table definition, so switching
+        # to diacritic folding (searching "Bronte" finds "Brontë") means
+        # recreating and rebuilding the index. The triggers reference the
+        # table by name and carry over unchanged.
+        conn.execute("DROP TABLE IF EXISTS book_fts")
+        conn.execute(
+            """CREATE VIRTUAL TABLE book_fts USING fts5(
+                title, author, publisher, year, content='book', content_rowid='id',
+                tokenize='unicode61 remove_diacritics 2'
+            )"""
+        )
+        conn.execute("INSERT INTO book_fts(book_fts) VALUES ('rebuild')")
+        conn.commit()
+
+    if row is None:
+        conn.execute("INSERT INTO schema_version (v) VALUES (?)", (SCHEMA_VERSION,))
+    else:
+        conn.execute("UPDATE schema_version SET v = ?", (SCHEMA_VERSION,))
     conn.commit()
-    conn.close()
 
 
 init_db()
 
 
+# The stack table is small and changes rarely, so the existence and
+# name-uniqueness checks on the write paths are answered from this in-process
+# mirror instead of a SELECT per request. It is only consulted and mutated
+# while holding the writer lock, which keeps it consistent with the database.
+_stack_ids: set[int] = set()
+_stack_names: dict[str, int] = {}
+for _row in _writer.execute("SELECT id, name FROM stack"):
+    _stack_ids.add(_row["id"])
+    _stack_names[_row["name"]] = _row["id"]
+
+
 # --- JWT Helpers ---
 
-USERNAME_RE = re.compile(r"^[a-zA-Z][a-zA-Z0-9_]*$")
+# Matched against the case-folded username: one fullmatch covers length,
+# charset, and the leading-letter rule in a single pass.
+USERNAME_RE = re.compile(r"[a-z][a-z0-9_]{2,23}")
+
+
+# A token minted in the last few seconds is reused rather than re-signed.
+# With 24h expiry, handing back a token up to 15s old is indistinguishable
+# to clients, but reconnect storms become a dict lookup instead of HS256.
+TOKEN_REISSUE_WINDOW_SECONDS = 15
+_token_cache: dict[tuple[int, int], tuple[str, float]] = {}
 
 
 def create_token(user_id: int, username: str, level: int) -> str:
+    now = time.monotonic()
+    cached = _token_cache.get((user_id, level))
+    if cached is not None and now < cached[1]:
+        return cached[0]
+
     payload = {
         "sub": str(user_id),
         "username": username,
         "level": level,
         "exp": datetime.now(timezone.utc) + timedelta(hours=JWT_EXPIRY_HOURS),
     }
-    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    token = jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+    _token_cache[(user_id, level)] = (token, now + TOKEN_REISSUE_WINDOW_SECONDS)
+    return token
+
+
+# Cache of validated token payloads so repeated requests with the same bearer
+# token skip the HMAC + JSON work in jwt.decode. Entries expire after a short
+# TTL (and never outlive the token's own exp claim).
+AUTH_CACHE_TTL_SECONDS = 30
+AUTH_CACHE_MAX_SIZE = 10_000
+_auth_cache: dict[str, tuple[dict, float]] = {}
 
 
 def require_auth(authorization: str):
     if not authorization or not authorization.startswith("Bearer "):
         raise HTTPException(status_code=401, detail="Not authenticated")
     token = authorization.split(" ", 1)[1]
+
+    now = time.time()
+    cached = _auth_cache.get(token)
+    if cached is not None:
+        payload, expires_at = cached
+        if now < expires_at:
+            return payload
+        del _auth_cache[token]
+
     try:
         payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
     except jwt.ExpiredSignatureError:
         raise HTTPException(status_code=401, detail="Token expired")
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=401, detail="Invalid token")
+
+    if len(_auth_cache) >= AUTH_CACHE_MAX_SIZE:
+        _auth_cache.clear()
+    _auth_cache[token] = (payload, min(now + AUTH_CACHE_TTL_SECONDS, payload["exp"]))
     return payload
 
 
@@ -117,27 +391,71 @@ def require_admin(authorization: str):
 
 
 def validate_username(username: str) -> str:
-    if not (3 <= len(username) <= 24):
-        raise HTTPException(status_code=400, detail="Username must be 3-24 characters")
-    if not USERNAME_RE.match(username):
+    username = username.strip().lower()
+    if not USERNAME_RE.fullmatch(username):
         raise HTTPException(
             status_code=400,
-            detail="Username must start with a letter and contain only letters, digits, and underscores",
+            detail="Username must be 3-24 characters, start with a letter, and contain only letters, digits, and underscores",
         )
-    return username.lower()
+    return username
+
+
+_UPPER = set(string.ascii_uppercase)
+_LOWER = set(string.ascii_lowercase)
+_DIGIT = set(string.digits)
 
 
 def validate_password(password: str):
     if not (8 <= len(password) <= 128):
         raise HTTPException(status_code=400, detail="Password must be 8-128 characters")
-    if not re.search(r"[A-Z]", password):
+    # One C-level set() build plus three intersection tests beats running
+    # the regex engine three times over the password
+    chars = set(password)
+    if not chars & _UPPER:
         raise HTTPException(status_code=400, detail="Password must contain at least one uppercase letter")
-    if not re.search(r"[a-z]", password):
+    if not chars & _LOWER:
         raise HTTPException(status_code=400, detail="Password must contain at least one lowercase letter")
-    if not re.search(r"[0-9]", password):
+    if not chars & _DIGIT:
         raise HTTPException(status_code=400, detail="Password must contain at least one digit")
 
 
+# --- Response cache ---
+
+# Read endpoints dominate a library browser, and their payloads only change
+# when something is written. Every cache key starts with _data_version, which
+# each write endpoint bumps after commit (always under the writer lock, so a
+# plain increment is safe): stale entries become unreachable instead of
+# needing explicit invalidation, and the dict is cleared wholesale when it
+# grows past the cap, mirroring _auth_cache.
+RESPONSE_CACHE_MAX_SIZE = 1024
+_data_version = 0
+_response_cache: dict[tuple, tuple[bytes, str]] = {}
+
+
+def bump_data_version():
+    global _data_version
+    _data_version += 1
+
+
+def cached_json_response(key: tuple, if_none_match: str | None, build) -> Response:
+    entry = _response_cache.get(key)
+    if entry is None:
+        body = orjson.dumps(build())
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        if len(_response_cache) >= RESPONSE_CACHE_MAX_SIZE:
+            _response_cache.clear()
+        _response_cache[key] = (body, etag)
+    else:
+        body, etag = entry
+    if if_none_match == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    return Response(
+        content=body,
+        media_type="application/json",
+        headers={"ETag": etag, "Cache-Control": "no-cache"},
+    )
+
+
 # --- Models ---
 
 class Book(BaseModel):
@@ -192,49 +510,69 @@ api = APIRouter(prefix="/api")
 
 
 @api.post("/register", response_model=UserResponse, status_code=201)
-def register(body: UserCreate):
+async def register(body: UserCreate):
     if not ALLOW_CREATE_ACCOUNT:
         raise HTTPException(status_code=403, detail="Account registration is not available")
 
     username = validate_username(body.username)
     validate_password(body.password)
 
-    password_hash = bcrypt.hashpw(body.password.encode(), bcrypt.gensalt()).decode()
-
-    conn = get_db()
-    existing = conn.execute("SELECT id FROM user WHERE username = ?", (username,)).fetchone()
-    if existing:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Username already taken")
-
-    try:
-        cur = conn.execute(
-            "INSERT INTO user (username, password_hash) VALUES (?, ?)",
-            (username, password_hash),
-        )
-        conn.commit()
-        user_id = cur.lastrowid
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
+    # bcrypt is ~100ms of pure CPU; run it in the threadpool and only open
+    # the DB connection once the hash is ready.
+    password_hash = (
+        await run_in_threadpool(bcrypt.hashpw, body.password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS))
+    ).decode()
+
+    # The uniqueness check runs on the writer so no other registration can
+    # slip in between the check and the insert.
+    with get_writer() as conn:
+        existing = conn.execute("SELECT id FROM user WHERE username = ?", (username,)).fetchone()
+        if existing:
+            raise HTTPException(status_code=400, detail="Username already taken")
+
+        try:
+            cur = conn.execute(
+                "INSERT INTO user (username, password_hash) VALUES (?, ?)",
+                (username, password_hash),
+            )
+            conn.commit()
+            user_id = cur.lastrowid
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
 
-    conn.close()
     return {"id": user_id, "username": username, "level": 1}
 
 
 @api.post("/login", response_model=TokenResponse)
-def login(body: UserLogin):
+async def login(body: UserLogin):
     username = body.username.strip().lower()
-    conn = get_db()
-    row = conn.execute(
-        "SELECT id, username, password_hash, level FROM user WHERE username = ?", (username,)
-    ).fetchone()
-    conn.close()
+    # Reject names that could never exist without touching the database
+    if not USERNAME_RE.fullmatch(username):
+        raise HTTPException(status_code=401, detail="Invalid username or password")
+    with get_reader() as conn:
+        row = conn.execute(
+            "SELECT id, username, password_hash, level FROM user WHERE username = ?", (username,)
+        ).fetchone()
 
-    if row is None or not bcrypt.checkpw(body.password.encode(), row["password_hash"].encode()):
+    # The reader goes back to the pool before the ~100ms bcrypt verification
+    # so it isn't held hostage while the threadpool grinds through the hash.
+    if row is None or not await run_in_threadpool(
+        bcrypt.checkpw, body.password.encode(), row["password_hash"].encode()
+    ):
         raise HTTPException(status_code=401, detail="Invalid username or password")
 
+    # Re-hash at the configured cost if the stored hash predates it, so cost
+    # changes roll out without forcing password resets ($2b$NN$... format).
+    stored_rounds = int(row["password_hash"].split("$")[2])
+    if stored_rounds != BCRYPT_ROUNDS:
+        new_hash = (
+            await run_in_threadpool(bcrypt.hashpw, body.password.encode(), bcrypt.gensalt(BCRYPT_ROUNDS))
+        ).decode()
+        with get_writer() as conn:
+            conn.execute("UPDATE user SET password_hash = ? WHERE id = ?", (new_hash, row["id"]))
+            conn.commit()
+
     token = create_token(row["id"], row["username"], row["level"])
     return {"token": token}
 
@@ -242,33 +580,28 @@ def login(body: UserLogin):
 @api.get("/users", response_model=list[UserResponse])
 def list_users(authorization: str = Header(...)):
     require_admin(authorization)
-    conn = get_db()
-    rows = conn.execute("SELECT id, username, level FROM user").fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+    with get_reader() as conn:
+        rows = conn.execute("SELECT id, username, level FROM user").fetchall()
+    return rows
 
 
 
-@api.get("/books", response_model=list[Book])
-def list_books():
-    conn = get_db()
-    rows = conn.execute("SELECT id, title, author, publisher, year, stack_id, position, user_id FROM book").fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
+# The full book list is the largest payload the API serves; the rows are
+# already shaped by the SELECT, so skip response_model validation and serve
+# the orjson bytes straight from the response cache between writes.
+@api.get("/books")
+def list_books(if_none_match: str | None = Header(None)):
+    def build():
+        # Iterating the cursor skips fetchall()'s intermediate list of Row
+        # objects, so the full table is materialized once (as dicts), not
+        # twice, and row fetching overlaps dict construction.
+        with get_reader() as conn:
+            return list(conn.execute(SQL_LIST_BOOKS))
 
+    return cached_json_response((_data_version, "books"), if_none_match, build)
 
-class BookSearchResult(BaseModel):
-    id: int
-    title: str
-    author: str | None
-    publisher: str | None
-    year: str | None
-    stack_id: int
-    stack_name: str
-    user_id: int | None
 
-
-@api.get("/books/search", response_model=list[BookSearchResult])
+@api.get("/books/search")
 def search_books(
     q: str = Query(..., min_length=1),
     title: bool = Query(True),
@@ -277,6 +610,7 @@ def search_books(
     year: bool = Query(False),
     user_id: int | None = Query(None),
     authorization: str = Header(...),
+    if_none_match: str | None = Header(None),
 ):
     caller = require_auth(authorization)
     caller_level = caller.get("level", 1)
@@ -289,75 +623,72 @@ def search_books(
         # Level 1: always search own books, ignore any user_id param
         search_user_id = caller_id
 
-    if not (title or author or publisher or year):
+    fields = (title, author, publisher, year)
+    if not any(fields):
         raise HTTPException(status_code=400, detail="At least one search field must be selected")
 
-    conn = get_db()
-    conditions = []
-    params = []
-    if title:
-        conditions.append("b.title LIKE ?")
-        params.append(f"%{q}%")
-    if author:
-        conditions.append("b.author LIKE ?")
-        params.append(f"%{q}%")
-    if publisher:
-        conditions.append("b.publisher LIKE ?")
-        params.append(f"%{q}%")
-    if year:
-        conditions.append("b.year LIKE ?")
-        params.append(f"%{q}%")
-
-    where = f"({' OR '.join(conditions)}) AND b.user_id = ?"
-    params.append(search_user_id)
-    rows = conn.execute(
-        f"SELECT b.id, b.title, b.author, b.publisher, b.year, b.stack_id, s.name as stack_name, b.user_id "
-        f"FROM book b JOIN stack s ON b.stack_id = s.id "
-        f"WHERE {where} ORDER BY b.title",
-        params,
-    ).fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
-
-
-@api.get("/book/{book_id}", response_model=Book)
-def get_book(book_id: int):
-    conn = get_db()
-    row = conn.execute(
-        "SELECT id, title, author, publisher, year, stack_id, position, user_id FROM book WHERE id = ?",
-        (book_id,),
-    ).fetchone()
-    conn.close()
-    if row is None:
-        raise HTTPException(status_code=404, detail="Book not found")
-    return dict(row)
+    def build():
+        # Quote each word so user input cannot inject FTS5 operators, and
+        # match on word prefixes so partial typing still finds books.
+        terms = [t for t in re.split(r"\W+", q) if t]
+        if terms:
+            match = "%s: %s" % (SEARCH_COLUMN_FILTER[fields], " ".join(f'"{t}"*' for t in terms))
+            with get_reader() as conn:
+                rows = conn.execute(SQL_SEARCH_BOOKS_FTS, (match, search_user_id)).fetchall()
+            return rows
+
+        # Queries with no indexable words (punctuation only) fall back to
+        # LIKE. SQLite allows a named parameter to be referenced from every
+        # condition, so the pattern is bound once however many columns are on.
+        with get_reader() as conn:
+            rows = conn.execute(
+                SQL_SEARCH_BOOKS_LIKE[fields],
+                {"q": f"%{q}%", "uid": search_user_id},
+            ).fetchall()
+        return rows
+
+    key = (_data_version, "search", search_user_id, q, fields)
+    return cached_json_response(key, if_none_match, build)
+
+
+@api.get("/book/{book_id}")
+def get_book(book_id: int, if_none_match: str | None = Header(None)):
+    def build():
+        with get_reader() as conn:
+            row = conn.execute(SQL_SELECT_BOOK, (book_id,)).fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Book not found")
+        return row
+
+    return cached_json_response((_data_version, "book", book_id), if_none_match, build)
 
 
-@api.get("/stacks", response_model=list[Stack])
-def list_stacks(authorization: str = Header(...)):
+@api.get("/stacks")
+def list_stacks(authorization: str = Header(...), if_none_match: str | None = Header(None)):
     caller = require_auth(authorization)
     caller_id = int(caller["sub"])
-    conn = get_db()
-    rows = conn.execute("SELECT id, name, location, user_id FROM stack WHERE user_id = ?", (caller_id,)).fetchall()
-    conn.close()
-    return [dict(r) for r in rows]
 
+    def build():
+        with get_reader() as conn:
+            rows = conn.execute(SQL_LIST_STACKS_FOR_USER, (caller_id,)).fetchall()
+        return rows
 
-@api.get("/stack/{stack_id}", response_model=StackDetail)
-def get_stack(stack_id: int, authorization: str = Header(...)):
+    return cached_json_response((_data_version, "stacks", caller_id), if_none_match, build)
+
+
+@api.get("/stack/{stack_id}")
+def get_stack(stack_id: int, authorization: str = Header(...), if_none_match: str | None = Header(None)):
     caller = require_auth(authorization)
     caller_id = int(caller["sub"])
-    conn = get_db()
-    stack = conn.execute("SELECT id, name, location, user_id FROM stack WHERE id = ? AND user_id = ?", (stack_id, caller_id)).fetchone()
-    if stack is None:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Stack not found")
-    books = conn.execute(
-        "SELECT id, title, author, publisher, year, stack_id, position, user_id FROM book WHERE stack_id = ? ORDER BY position",
-        (stack_id,),
-    ).fetchall()
-    conn.close()
-    return {"id": stack["id"], "name": stack["name"], "location": stack["location"], "user_id": stack["user_id"], "books": [dict(b) for b in books]}
+
+    def build():
+        with get_reader() as conn:
+            stack = conn.execute(SQL_STACK_WITH_BOOKS, (stack_id, caller_id)).fetchone()
+        if stack is None:
+            raise HTTPException(status_code=404, detail="Stack not found")
+        return {"id": stack["id"], "name": stack["name"], "location": stack["location"], "user_id": stack["user_id"], "books": json.loads(stack["books"])}
+
+    return cached_json_response((_data_version, "stack", stack_id, caller_id), if_none_match, build)
 
 
 class StackCreate(BaseModel):
@@ -385,29 +716,26 @@ def create_stack(body: StackCreate, authorization: str = Header(...)):
 
     location = body.location.strip() if body.location else None
 
-    conn = get_db()
-
-    # Validate user_id exists
-    target_user = conn.execute("SELECT id FROM user WHERE id = ?", (stack_user_id,)).fetchone()
-    if target_user is None:
-        conn.close()
-        raise HTTPException(status_code=400, detail="User not found")
+    with get_writer() as conn:
+        # Validate user_id exists
+        target_user = conn.execute(SQL_SELECT_USER_ID, (stack_user_id,)).fetchone()
+        if target_user is None:
+            raise HTTPException(status_code=400, detail="User not found")
 
-    existing = conn.execute("SELECT id FROM stack WHERE name = ?", (name,)).fetchone()
-    if existing:
-        conn.close()
-        raise HTTPException(status_code=400, detail="A stack with that name already exists")
+        if name in _stack_names:
+            raise HTTPException(status_code=400, detail="A stack with that name already exists")
 
-    try:
-        cur = conn.execute("INSERT INTO stack (name, location, user_id) VALUES (?, ?, ?)", (name, location, stack_user_id))
-        conn.commit()
-        stack_id = cur.lastrowid
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
+        try:
+            cur = conn.execute(SQL_INSERT_STACK, (name, location, stack_user_id))
+            conn.commit()
+            bump_data_version()
+            stack_id = cur.lastrowid
+            _stack_ids.add(stack_id)
+            _stack_names[name] = stack_id
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
 
-    conn.close()
     return {"id": stack_id, "name": name, "location": location, "user_id": stack_user_id}
 
 
@@ -444,58 +772,51 @@ def create_book(body: BookCreate, authorization: str = Header(...)):
     if body.position not in ("beginning", "end"):
         raise HTTPException(status_code=400, detail="position must be 'beginning' or 'end'")
 
-    conn = get_db()
-
-    # Validate user_id exists
-    target_user = conn.execute("SELECT id FROM user WHERE id = ?", (book_user_id,)).fetchone()
-    if target_user is None:
-        conn.close()
-        raise HTTPException(status_code=400, detail="User not found")
+    with get_writer() as conn:
+        # Validate user_id exists
+        target_user = conn.execute(SQL_SELECT_USER_ID, (book_user_id,)).fetchone()
+        if target_user is None:
+            raise HTTPException(status_code=400, detail="User not found")
 
-    stack = conn.execute("SELECT id FROM stack WHERE id = ?", (body.stack_id,)).fetchone()
-    if stack is None:
-        conn.close()
-        raise HTTPException(status_code=400, detail="Stack not found")
+        if body.stack_id not in _stack_ids:
+            raise HTTPException(status_code=400, detail="Stack not found")
 
-    try:
-        existing = conn.execute(
-            "SELECT id, position FROM book WHERE stack_id = ? ORDER BY position",
-            (body.stack_id,),
-        ).fetchall()
-
-        if body.position == "beginning":
-            # Shift existing books up to make room at position 0
-            for b in existing:
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if body.position == "beginning":
+                # Shift the whole stack up one slot. Two set-based passes
+                # through negative temporaries keep every intermediate row
+                # unique under the (stack_id, position) constraint.
                 conn.execute(
-                    "UPDATE book SET position = ? WHERE id = ?",
-                    (-(b["position"] + 2), b["id"]),
+                    "UPDATE book SET position = -position - 2 WHERE stack_id = ?",
+                    (body.stack_id,),
                 )
-            for b in existing:
                 conn.execute(
-                    "UPDATE book SET position = ? WHERE id = ?",
-                    (b["position"] + 1, b["id"]),
+                    "UPDATE book SET position = -position - 1 WHERE stack_id = ? AND position < 0",
+                    (body.stack_id,),
                 )
-            new_pos = 0
-        else:
-            new_pos = len(existing)
-
-        cur = conn.execute(
-            "INSERT INTO book (title, author, publisher, year, stack_id, position, user_id) VALUES (?, ?, ?, ?, ?, ?, ?)",
-            (title, body.author, body.publisher, body.year, body.stack_id, new_pos, book_user_id),
-        )
-        conn.commit()
-        book_id = cur.lastrowid
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
+                cur = conn.execute(
+                    SQL_INSERT_BOOK,
+                    (title, body.author, body.publisher, body.year, body.stack_id, 0, book_user_id),
+                )
+            else:
+                # The end slot comes from MAX(position) inside the INSERT
+                # itself, so no rows are pulled into Python at all.
+                cur = conn.execute(
+                    SQL_INSERT_BOOK_AT_END,
+                    (title, body.author, body.publisher, body.year, body.stack_id, body.stack_id, book_user_id),
+                )
+            row = cur.fetchone() if HAS_RETURNING else None
+            book_id = cur.lastrowid
+            conn.commit()
+            bump_data_version()
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
 
-    row = conn.execute(
-        "SELECT id, title, author, publisher, year, stack_id, position, user_id FROM book WHERE id = ?",
-        (book_id,),
-    ).fetchone()
-    conn.close()
-    return dict(row)
+        if row is None:
+            row = conn.execute(SQL_SELECT_BOOK, (book_id,)).fetchone()
+    return row
 
 
 class BookUpdate(BaseModel):
@@ -515,113 +836,95 @@ def update_book(book_id: int, body: BookUpdate, authorization: str = Header(...)
     if caller_level < 2 and body.user_id is not None:
         raise HTTPException(status_code=400, detail="Normal users cannot specify user_id")
 
-    if caller_level >= 2 and body.user_id is not None:
-        conn_check = get_db()
-        target_user = conn_check.execute("SELECT id FROM user WHERE id = ?", (body.user_id,)).fetchone()
-        conn_check.close()
-        if target_user is None:
-            raise HTTPException(status_code=400, detail="User not found")
+    with get_writer() as conn:
+        if caller_level >= 2 and body.user_id is not None:
+            target_user = conn.execute(SQL_SELECT_USER_ID, (body.user_id,)).fetchone()
+            if target_user is None:
+                raise HTTPException(status_code=400, detail="User not found")
 
-    conn = get_db()
-    row = conn.execute(
-        "SELECT id, stack_id, position FROM book WHERE id = ?", (book_id,)
-    ).fetchone()
-    if row is None:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Book not found")
+        row = conn.execute(
+            "SELECT id, stack_id, position FROM book WHERE id = ?", (book_id,)
+        ).fetchone()
+        if row is None:
+            raise HTTPException(status_code=404, detail="Book not found")
 
-    if not body.title.strip():
-        conn.close()
-        raise HTTPException(status_code=400, detail="Title cannot be empty")
+        if not body.title.strip():
+            raise HTTPException(status_code=400, detail="Title cannot be empty")
 
-    new_stack_id = body.stack_id if body.stack_id is not None else row["stack_id"]
+        new_stack_id = body.stack_id if body.stack_id is not None else row["stack_id"]
 
-    # Validate target stack exists
-    if new_stack_id != row["stack_id"]:
-        target_stack = conn.execute(
-            "SELECT id FROM stack WHERE id = ?", (new_stack_id,)
-        ).fetchone()
-        if target_stack is None:
-            conn.close()
+        # Validate target stack exists
+        if new_stack_id != row["stack_id"] and new_stack_id not in _stack_ids:
             raise HTTPException(status_code=400, detail="Target stack not found")
 
-    try:
-        if new_stack_id != row["stack_id"]:
-            old_stack_id = row["stack_id"]
-            old_position = row["position"]
-
-            # Move the book to a temporary position to avoid conflicts
-            conn.execute(
-                "UPDATE book SET position = -1, stack_id = ? WHERE id = ?",
-                (new_stack_id, book_id),
-            )
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            if new_stack_id != row["stack_id"]:
+                old_stack_id = row["stack_id"]
+                old_position = row["position"]
 
-            # Shift books in old stack down to fill the gap
-            old_books = conn.execute(
-                "SELECT id, position FROM book WHERE stack_id = ? AND position > ? ORDER BY position",
-                (old_stack_id, old_position),
-            ).fetchall()
-            for b in old_books:
-                conn.execute(
-                    "UPDATE book SET position = ? WHERE id = ?",
-                    (-(b["position"] + 1), b["id"]),
-                )
-            for b in old_books:
+                # Move the book to a temporary position to avoid conflicts
                 conn.execute(
-                    "UPDATE book SET position = ? WHERE id = ?",
-                    (b["position"] - 1, b["id"]),
+                    "UPDATE book SET position = -1, stack_id = ? WHERE id = ?",
+                    (new_stack_id, book_id),
                 )
 
-            # Shift books in new stack up to make room at position 0
-            new_books = conn.execute(
-                "SELECT id, position FROM book WHERE stack_id = ? AND id != ? ORDER BY position",
-                (new_stack_id, book_id),
-            ).fetchall()
-            for b in new_books:
+                # Shift books in old stack down to fill the gap. Each shift
+                # is two set-based passes through negative temporaries so
+                # every intermediate row stays unique under the
+                # (stack_id, position) constraint.
                 conn.execute(
-                    "UPDATE book SET position = ? WHERE id = ?",
-                    (-(b["position"] + 2), b["id"]),
+                    "UPDATE book SET position = -position - 1 WHERE stack_id = ? AND position > ?",
+                    (old_stack_id, old_position),
                 )
-            for b in new_books:
                 conn.execute(
-                    "UPDATE book SET position = ? WHERE id = ?",
-                    (b["position"] + 1, b["id"]),
+                    "UPDATE book SET position = -position - 2 WHERE stack_id = ? AND position < 0",
+                    (old_stack_id,),
                 )
 
-            # Place the book at position 0 with updated fields
-            if body.user_id is not None:
+                # Shift books in new stack up to make room at position 0
+                # (the moved book itself is parked at -1)
                 conn.execute(
-                    "UPDATE book SET title = ?, author = ?, publisher = ?, year = ?, position = 0, user_id = ? WHERE id = ?",
-                    (body.title.strip(), body.author, body.publisher, body.year, body.user_id, book_id),
+                    "UPDATE book SET position = -position - 2 WHERE stack_id = ? AND id != ?",
+                    (new_stack_id, book_id),
                 )
-            else:
                 conn.execute(
-                    "UPDATE book SET title = ?, author = ?, publisher = ?, year = ?, position = 0 WHERE id = ?",
-                    (body.title.strip(), body.author, body.publisher, body.year, book_id),
+                    "UPDATE book SET position = -position - 1 WHERE stack_id = ? AND position < -1",
+                    (new_stack_id,),
                 )
-        else:
-            if body.user_id is not None:
-                conn.execute(
-                    "UPDATE book SET title = ?, author = ?, publisher = ?, year = ?, user_id = ? WHERE id = ?",
-                    (body.title.strip(), body.author, body.publisher, body.year, body.user_id, book_id),
-                )
-            else:
-                conn.execute(
-                    "UPDATE book SET title = ?, author = ?, publisher = ?, year = ? WHERE id = ?",
-                    (body.title.strip(), body.author, body.publisher, body.year, book_id),
-                )
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
 
-    updated = conn.execute(
-        "SELECT id, title, author, publisher, year, stack_id, position, user_id FROM book WHERE id = ?",
-        (book_id,),
-    ).fetchone()
-    conn.close()
-    return dict(updated)
+                # Place the book at position 0 with updated fields
+                if body.user_id is not None:
+                    cur = conn.execute(
+                        "UPDATE book SET title = ?, author = ?, publisher = ?, year = ?, position = 0, user_id = ? WHERE id = ?" + RETURNING_BOOK,
+                        (body.title.strip(), body.author, body.publisher, body.year, body.user_id, book_id),
+                    )
+                else:
+                    cur = conn.execute(
+                        "UPDATE book SET title = ?, author = ?, publisher = ?, year = ?, position = 0 WHERE id = ?" + RETURNING_BOOK,
+                        (body.title.strip(), body.author, body.publisher, body.year, book_id),
+                    )
+            else:
+                if body.user_id is not None:
+                    cur = conn.execute(
+                        "UPDATE book SET title = ?, author = ?, publisher = ?, year = ?, user_id = ? WHERE id = ?" + RETURNING_BOOK,
+                        (body.title.strip(), body.author, body.publisher, body.year, body.user_id, book_id),
+                    )
+                else:
+                    cur = conn.execute(
+                        "UPDATE book SET title = ?, author = ?, publisher = ?, year = ? WHERE id = ?" + RETURNING_BOOK,
+                        (body.title.strip(), body.author, body.publisher, body.year, book_id),
+                    )
+            updated = cur.fetchone() if HAS_RETURNING else None
+            conn.commit()
+            bump_data_version()
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+
+        if updated is None:
+            updated = conn.execute(SQL_SELECT_BOOK, (book_id,)).fetchone()
+    return updated
 
 
 class StackUpdate(BaseModel):
@@ -637,28 +940,25 @@ def update_stack(stack_id: int, body: StackUpdate):
 
     location = body.location.strip() if body.location else None
 
-    conn = get_db()
-    stack = conn.execute("SELECT id, name, user_id FROM stack WHERE id = ?", (stack_id,)).fetchone()
-    if stack is None:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Stack not found")
-
-    # Check name uniqueness if changed
-    if name != stack["name"]:
-        dup = conn.execute("SELECT id FROM stack WHERE name = ? AND id != ?", (name, stack_id)).fetchone()
-        if dup:
-            conn.close()
+    with get_writer() as conn:
+        stack = conn.execute("SELECT id, name, user_id FROM stack WHERE id = ?", (stack_id,)).fetchone()
+        if stack is None:
+            raise HTTPException(status_code=404, detail="Stack not found")
+
+        # Check name uniqueness if changed
+        if name != stack["name"] and _stack_names.get(name, stack_id) != stack_id:
             raise HTTPException(status_code=400, detail="A stack with that name already exists")
 
-    try:
-        conn.execute("UPDATE stack SET name = ?, location = ? WHERE id = ?", (name, location, stack_id))
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
+        try:
+            conn.execute("UPDATE stack SET name = ?, location = ? WHERE id = ?", (name, location, stack_id))
+            conn.commit()
+            bump_data_version()
+            _stack_names.pop(stack["name"], None)
+            _stack_names[name] = stack_id
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
 
-    conn.close()
     return {"id": stack_id, "name": name, "location": location, "user_id": stack["user_id"]}
 
 
@@ -668,47 +968,68 @@ class ReorderRequest(BaseModel):
 
 @api.put("/stack/{stack_id}", response_model=StackDetail)
 def reorder_stack(stack_id: int, body: ReorderRequest):
-    conn = get_db()
-    stack = conn.execute("SELECT id, name, location, user_id FROM stack WHERE id = ?", (stack_id,)).fetchone()
-    if stack is None:
-        conn.close()
-        raise HTTPException(status_code=404, detail="Stack not found")
-
-    # Verify all book IDs belong to this stack
-    existing = conn.execute(
-        "SELECT id FROM book WHERE stack_id = ? ORDER BY position", (stack_id,)
-    ).fetchall()
-    existing_ids = {r["id"] for r in existing}
-
-    if set(body.book_ids) != existing_ids:
-        conn.close()
-        raise HTTPException(
-            status_code=400,
-            detail="book_ids must contain exactly the books in this stack",
-        )
-
-    try:
-        # Use negative temporary positions to avoid unique constraint conflicts
-        for i, book_id in enumerate(body.book_ids):
-            conn.execute(
-                "UPDATE book SET position = ? WHERE id = ?", (-(i + 1), book_id)
-            )
-        for i, book_id in enumerate(body.book_ids):
-            conn.execute(
-                "UPDATE book SET position = ? WHERE id = ?", (i, book_id)
+    if len(body.book_ids) > 10_000:
+        raise HTTPException(status_code=400, detail="Too many book_ids")
+
+    with get_writer() as conn:
+        stack = conn.execute("SELECT id, name, location, user_id FROM stack WHERE id = ?", (stack_id,)).fetchone()
+        if stack is None:
+            raise HTTPException(status_code=404, detail="Stack not found")
+
+        # Verify book_ids is exactly the set of books in this stack, without
+        # pulling every id into Python: the stack's row count must equal the
+        # list length and every row's id must appear in the list (duplicates
+        # in the list fail the count comparison).
+        if body.book_ids:
+            placeholders = ",".join("?" * len(body.book_ids))
+            counts = conn.execute(
+                f"SELECT COUNT(*) AS total, COALESCE(SUM(id IN ({placeholders})), 0) AS matched "
+                "FROM book WHERE stack_id = ?",
+                (*body.book_ids, stack_id),
+            ).fetchone()
+            valid = counts["total"] == len(body.book_ids) and counts["matched"] == counts["total"]
+        else:
+            valid = conn.execute(
+                "SELECT NOT EXISTS (SELECT 1 FROM book WHERE stack_id = ?) AS empty", (stack_id,)
+            ).fetchone()["empty"]
+
+        if not valid:
+            raise HTTPException(
+                status_code=400,
+                detail="book_ids must contain exactly the books in this stack",
             )
-        conn.commit()
-    except Exception as e:
-        conn.rollback()
-        conn.close()
-        raise HTTPException(status_code=500, detail=str(e))
 
-    books = conn.execute(
-        "SELECT id, title, author, publisher, year, stack_id, position, user_id FROM book WHERE stack_id = ? ORDER BY position",
-        (stack_id,),
-    ).fetchall()
-    conn.close()
-    return {"id": stack["id"], "name": stack["name"], "location": stack["location"], "user_id": stack["user_id"], "books": [dict(b) for b in books]}
+        try:
+            # One transaction for the whole renumbering: the write lock is
+            # taken once and WAL coalesces the fsyncs into a single commit.
+            conn.execute("BEGIN IMMEDIATE")
+            if body.book_ids:
+                # Map every book to its new position in one set-based UPDATE
+                # over a VALUES CTE instead of one statement per row. The
+                # UNIQUE(stack_id, position) constraint is checked per row
+                # mid-scan, so the first pass lands on negative temporaries
+                # and a second pass flips them to the final positions.
+                values = ",".join(["(?, ?)"] * len(body.book_ids))
+                params = [x for i, book_id in enumerate(body.book_ids) for x in (book_id, i)]
+                conn.execute(
+                    f"WITH order_map(id, new_pos) AS (VALUES {values}) "
+                    "UPDATE book SET position = "
+                    "-(SELECT new_pos FROM order_map WHERE order_map.id = book.id) - 1 "
+                    "WHERE id IN (SELECT id FROM order_map)",
+                    params,
+                )
+                conn.execute(
+                    "UPDATE book SET position = -position - 1 WHERE stack_id = ? AND position < 0",
+                    (stack_id,),
+                )
+            conn.commit()
+            bump_data_version()
+        except Exception as e:
+            conn.rollback()
+            raise HTTPException(status_code=500, detail=str(e))
+
+        books = conn.execute(SQL_STACK_BOOKS_JSON, (stack_id,)).fetchone()
+    return {"id": stack["id"], "name": stack["name"], "location": stack["location"], "user_id": stack["user_id"], "books": json.loads(books["books"])}
 
 
 app.include_router(api)
@@ -716,14 +1037,116 @@ app.include_router(api)
 
 # --- Frontend Routes ---
 
+STATIC_DIR = Path(__file__).parent / "static"
+
+
+# The static directory is tiny (the SPA and a couple of images), so every
+# asset is held in memory with a pre-compressed gzip body; serving one is a
+# dict lookup instead of a stat+open+read per request.
+def _build_static_cache() -> dict[str, tuple[bytes, bytes | None, str, str]]:
+    cache = {}
+    for path in STATIC_DIR.rglob("*"):
+        if not path.is_file():
+            continue
+        body = path.read_bytes()
+        etag = f'"{hashlib.md5(body).hexdigest()}"'
+        media_type = mimetypes.guess_type(path.name)[0] or "application/octet-stream"
+        compressed = gzip.compress(body)
+        gzip_body = compressed if len(compressed) < len(body) else None
+        cache["/static/" + path.relative_to(STATIC_DIR).as_posix()] = (body, gzip_body, etag, media_type)
+    return cache
+
+
+_static_cache = _build_static_cache()
+
+
+@app.middleware("http")
+async def static_from_memory(request: Request, call_next):
+    asset = _static_cache.get(request.url.path)
+    if asset is None:
+        # Anything not cached at startup falls through to StaticFiles
+        return await call_next(request)
+    body, gzip_body, etag, media_type = asset
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if gzip_body is not None and "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+        headers["Vary"] = "Accept-Encoding"
+        body = gzip_body
+    return Response(content=body, media_type=media_type, headers=headers)
+
+
+# The SPA entrypoint is read once at startup; FileResponse would re-stat and
+# reopen it on every navigation. no-cache makes browsers revalidate via the
+# ETag, so deploys still take effect after a refresh.
+INDEX_PATH = Path(__file__).parent / "static" / "index.html"
+INDEX_BYTES = INDEX_PATH.read_bytes()
+INDEX_ETAG = f'"{hashlib.md5(INDEX_BYTES).hexdigest()}"'
+INDEX_MTIME = INDEX_PATH.stat().st_mtime
+
+# Opt-in for development: pay one stat per request and re-read index.html
+# when it changes on disk, so edits show up without restarting the server.
+RELOAD_INDEX = os.environ.get("RELOAD_INDEX", "").lower() in ("1", "true", "yes")
+
+
+def _index_response(if_none_match: str | None) -> Response:
+    if RELOAD_INDEX:
+        global INDEX_BYTES, INDEX_ETAG, INDEX_MTIME
+        mtime = INDEX_PATH.stat().st_mtime
+        if mtime != INDEX_MTIME:
+            INDEX_BYTES = INDEX_PATH.read_bytes()
+            INDEX_ETAG = f'"{hashlib.md5(INDEX_BYTES).hexdigest()}"'
+            INDEX_MTIME = mtime
+    if if_none_match == INDEX_ETAG:
+        return Response(status_code=304, headers={"ETag": INDEX_ETAG})
+    return Response(
+        content=INDEX_BYTES,
+        media_type="text/html",
+        headers={"ETag": INDEX_ETAG, "Cache-Control": "no-cache"},
+    )
+
+
 @app.get("/", include_in_schema=False)
-def root():
-    return FileResponse("static/index.html")
+def root(if_none_match: str | None = Header(None)):
+    return _index_response(if_none_match)
+
+
+# Fallback mount for assets that appear on disk after startup and therefore
+# miss the in-memory middleware cache above. The first hit reads and caches
+# the bytes keyed by (mtime, size); later hits are served from memory with
+# the same ETag/304 handling, so even late-added files cost one stat instead
+# of stat+open+sendfile per request.
+class CachedStaticFiles(StaticFiles):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._cache: dict[str, tuple[tuple[float, int], bytes, str, str]] = {}
+
+    async def get_response(self, path: str, scope) -> Response:
+        full_path, stat_result = self.lookup_path(path)
+        if stat_result is None or not stat.S_ISREG(stat_result.st_mode):
+            return await super().get_response(path, scope)
+        file_key = (stat_result.st_mtime, stat_result.st_size)
+        entry = self._cache.get(path)
+        if entry is None or entry[0] != file_key:
+            body = Path(full_path).read_bytes()
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            media_type = mimetypes.guess_type(full_path)[0] or "application/octet-stream"
+            entry = (file_key, body, etag, media_type)
+            self._cache[path] = entry
+        _, body, etag, media_type = entry
+        if Request(scope).headers.get("if-none-match") == etag:
+            return Response(status_code=304, headers={"ETag": etag})
+        return Response(
+            content=body,
+            media_type=media_type,
+            headers={"ETag": etag, "Cache-Control": "no-cache"},
+        )
 
 
-app.mount("/static", StaticFiles(directory="static"), name="static")
+app.mount("/static", CachedStaticFiles(directory="static"), name="static")
 
 
 @app.get("/{path:path}", include_in_schema=False)
-def frontend_catchall(path: str):
-    return FileResponse("static/index.html")
+def frontend_catchall(path: str, if_none_match: str | None = Header(None)):
+    return _index_response(if_none_match)
@@ -2,7 +2,7 @@
 """Backup garage-library.db to DATABASE_BACKUP_DIRECTORY."""
 
 import os
-import shutil
+import sqlite3
 import sys
 from datetime import datetime
 from pathlib import Path
@@ -29,7 +29,17 @@ def main():
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     dest = DEST_DIR / f"garage-library_{timestamp}.db"
 
-    shutil.copy2(SRC, dest)
+    # SQLite's online backup API copies at page granularity with proper
+    # locking, so the result is consistent even if the app is mid-write
+    # (a plain file copy under WAL would miss the -wal file). Copying in
+    # batches of 1000 pages yields between batches so writers aren't blocked.
+    src = sqlite3.connect(SRC)
+    dst = sqlite3.connect(dest)
+    try:
+        src.backup(dst, pages=1000)
+    finally:
+        dst.close()
+        src.close()
     print(f"Backed up to {dest}")
 
 